@@ -5,71 +5,502 @@ MiniMax Coding Agent - 持续Coding代理系统
 
 核心特性：
 - 双代理模式：初始化代理 + 编码代理
-- 记忆持久化：claude-progress.txt + feature_list.json
+- 记忆持久化：claude-progress.txt + feature_list.ndjson
 - Git 集成：自动提交、状态恢复
 - 增量开发：每次会话只做一个功能
 """
 
+import asyncio
+import mmap
 import os
 import json
-import subprocess
 import sys
+import threading
 from datetime import datetime
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
-from typing import Optional
+from typing import Any, AsyncIterator, Awaitable, Final, Iterable, Iterator, Optional
 
-# 导入 MiniMax SDK
+# 导入异步 HTTP 客户端
 try:
-    from minimax import MiniMaxClient
+    import httpx
 except ImportError:
-    print("请安装 MiniMax SDK: pip install minimax")
+    print("请安装 httpx: pip install 'httpx[http2]'")
     sys.exit(1)
 
+# 可选：更快的 JSON 编解码；未安装时回退到标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+else:
+    _json_loads = json.loads
+
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+# 可选：只解码 passes 字段的功能状态解码器；未安装时完整解码后取字段
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if msgspec is not None:
+    class _FeatureStatus(msgspec.Struct):
+        """功能的完成状态；其余字段在解码时直接跳过
+
+        passes 不限定类型（LLM 可能写出 null、0、"false"），按 bool() 判定，
+        与完整解码后 bool(f.get("passes", False)) 的结果一致。
+        """
+        passes: Any = False
+
+    _status_decoder = msgspec.json.Decoder(_FeatureStatus)
+
+    def _decode_passes(raw: bytes) -> bool:
+        return bool(_status_decoder.decode(raw).passes)
+else:
+    def _decode_passes(raw: bytes) -> bool:
+        obj = _json_loads(raw)
+        if not isinstance(obj, dict):
+            raise ValueError("feature must be a JSON object")
+        return bool(obj.get("passes", False))
+
+# 可选：libgit2 绑定，进程内完成 git log / commit；未安装时回退到 git 子进程
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None
+
+# 可选：按 token 截断提示上下文；未安装时按字符数近似
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+# 系统提示在运行期不会变化，模块加载时构建一次
+SYS_INIT: Final[str] = """你是项目的初始化代理。你的任务是：
+1. 设置项目的初始环境
+2. 创建详细的 feature_list.ndjson，列出所有需要实现的功能
+3. 创建 init.sh 启动脚本
+4. 创建 claude-progress.txt 记录项目状态
+5. 进行初始的 git 提交
+
+工作流程：
+- 仔细阅读用户的任务需求
+- 将需求分解为具体的、可测试的功能点
+- 每个功能包含：分类、描述、测试步骤
+- 标记所有功能为 "passes": false
+- 写一个 init.sh 可以启动开发服务器
+- 初始提交所有文件
+
+输出格式：
+- feature_list.ndjson: NDJSON 格式的功能列表（每行一个功能）
+- init.sh: 启动脚本
+- claude-progress.txt: 初始进度记录"""
+
+SYS_CODING: Final[str] = """你是项目的编码代理。你的任务是：
+1. 每次会话只实现一个功能
+2. 实现后进行端到端测试
+3. 更新 feature_list.ndjson 中对应功能的状态
+4. 提交 git 并更新进度文件
+
+工作流程：
+1. 首先获取当前状态：
+   - 运行 pwd 查看工作目录
+   - 读取 claude-progress.txt 了解最近工作
+   - 读取 feature_list.ndjson 选择下一个要实现的功能
+   - 检查 git 日志
+   
+2. 实现功能：
+   - 只实现一个功能点
+   - 写清晰的代码
+   - 添加必要的注释
+   
+3. 测试验证：
+   - 运行端到端测试
+   - 只有测试通过才标记为完成
+   - 更新 feature_list.ndjson 中的 passes 字段
+   
+4. 结束会话：
+   - Git 提交：描述做了什么
+   - 更新 claude-progress.txt
+   - 如果有远程，推送代码
+
+重要规则：
+- 一次只做一个功能
+- 必须测试通过才能标记完成
+- 不能因为已经做了些工作就宣布项目完成"""
+
+# 编码会话中不随状态变化的提示片段
+_CODING_DEFAULT_INSTRUCTION: Final[str] = """请选择 feature_list.ndjson 中优先级最高的未完成功能进行实现。
+实现后更新功能状态，进行测试，然后提交代码。"""
+
+
+# 初始化响应应包含的代码块数：feature_list.ndjson、init.sh、claude-progress.txt
+_INIT_EXPECTED_BLOCKS: Final[int] = 3
+
+
+def _parse_sse(line: str) -> Optional[str]:
+    """解析一行 SSE 数据，返回增量文本（没有文本时返回 None）"""
+    if not line.startswith("data:"):
+        return None
+    payload = line[5:].strip()
+    if not payload or payload == "[DONE]":
+        return None
+    try:
+        data = _json_loads(payload)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    choices = data.get("choices")
+    if not isinstance(choices, list) or not choices or not isinstance(choices[0], dict):
+        return None
+    delta = choices[0].get("delta")
+    if not isinstance(delta, dict):
+        return None
+    content = delta.get("content")
+    return content if isinstance(content, str) else None
+
+
+class _CodeBlockTracker:
+    """增量统计流式文本中已闭合的 markdown 代码块数量"""
+    
+    def __init__(self):
+        self._partial = ""
+        self._fences = 0
+    
+    @property
+    def closed(self) -> int:
+        return self._fences // 2
+    
+    def feed(self, chunk: str) -> None:
+        *lines, self._partial = (self._partial + chunk).split("\n")
+        for line in lines:
+            if line.lstrip().startswith("```"):
+                self._fences += 1
+
+
+@lru_cache(maxsize=None)
+def _get_encoding():
+    """加载分词器（MiniMax 未公开分词器，用 cl100k_base 近似）；不可用时返回 None"""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def _fit(text: str, budget: int) -> str:
+    """将文本截断到 budget 个 token 以内，保留尾部
+
+    调用方需把最重要的内容放在末尾；首次调用可能需要加载分词器，应在线程中执行。
+    """
+    if budget < 1:
+        raise ValueError(f"budget must be >= 1, got {budget}")
+    enc = _get_encoding()
+    if enc is None:
+        # 中文文本大致一字一 token，按字符数近似
+        if len(text) <= budget:
+            return text
+        tail = text[-budget:]
+    else:
+        toks = enc.encode(text)
+        if len(toks) <= budget:
+            return text
+        # 截断点可能落在多字节汉字中间，去掉解码出的残缺字符
+        tail = enc.decode(toks[-budget:]).lstrip("\ufffd")
+    # 从行边界开始，避免保留半行（如半条提交记录）
+    _, sep, rest = tail.partition("\n")
+    return rest if sep and rest else tail
+
+
+async def _bounded_map(coros: Iterable[Awaitable], k: int) -> AsyncIterator[asyncio.Task]:
+    """滑动窗口提交协程：始终最多 k 个在执行，完成一个再提交下一个
+
+    按完成顺序产出已完成的 Task；coros 可以是惰性生成器，不会一次性全部创建。
+    """
+    if k < 1:
+        raise ValueError(f"k must be >= 1, got {k}")
+    pending: set[asyncio.Task] = set()
+    for coro in coros:
+        if len(pending) >= k:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task
+        pending.add(asyncio.ensure_future(coro))
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            yield task
+
 
 class MiniMaxCodingAgent:
     """基于 MiniMax 的持续Coding代理"""
     
-    def __init__(self, api_key: str, base_url: str = "https://api.minimax.chat"):
-        self.client = MiniMaxClient(api_key=api_key, base_url=base_url)
+    def __init__(self, api_key: str, base_url: str = "https://api.minimax.chat",
+                 max_concurrency: int = 4, max_ctx_tokens: int = 16384):
+        self.api_key = api_key
+        self.base_url = base_url
+        # 连接池化的 HTTP 客户端，在 async with 期间复用（见 __aenter__）
+        self.aclient: Optional[httpx.AsyncClient] = None
         self.project_dir = Path(__file__).parent
         self.workspace_dir = self.project_dir / "workspace"
         self.workspace_dir.mkdir(exist_ok=True)
         
         # 文件路径
         self.progress_file = self.project_dir / "claude-progress.txt"
-        self.feature_file = self.project_dir / "feature_list.json"
+        self.feature_file = self.project_dir / "feature_list.ndjson"
+        self.legacy_feature_file = self.project_dir / "feature_list.json"
         self.init_script = self.project_dir / "init.sh"
+        self.bearings_cache_file = self.progress_file.with_name(".bearings.cache.json")
+        
+        # 并发调用 MiniMax 的上限（受 API 速率限制约束）
+        self.max_concurrency = max_concurrency
+        
+        # 编码会话上下文的 token 上限，超出时截断头部
+        self.max_ctx_tokens = max_ctx_tokens
+        
+        # 后台任务（会话结束后的 git 提交等），与下一次 LLM 请求重叠执行
+        self._background: set[asyncio.Task] = set()
+        self._commit_lock = asyncio.Lock()
+        
+        # get_bearings 的结果缓存：(文件 mtime 键, 状态)
+        self._bearings_cache: Optional[tuple[tuple, dict]] = None
         
-    def call_minimax(self, system_prompt: str, user_prompt: str, max_tokens: int = 8192) -> str:
-        """调用 MiniMax API"""
-        response = self.client.chat.completions.create(
-            model="MiniMax-M2.1",  # 或 MiniMax-M2
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            max_tokens=max_tokens,
-            temperature=0.7
+        # pygit2 仓库句柄，首次使用时打开
+        self._repo = None
+        # libgit2 仓库对象不能被多个线程同时使用，所有 pygit2 调用都在此锁内执行
+        self._repo_lock = threading.Lock()
+        # 工作目录所属仓库的 git 目录（可能在上级目录），首次找到后缓存
+        self._git_dir: Optional[Path] = None
+        
+        # 跨进程复用：启动时加载上次的快照，aclose() 时写回
+        self._load_bearings_cache()
+        
+    async def call_minimax(self, system_prompt: str, user_prompt: str, max_tokens: int = 8192,
+                           expected_blocks: Optional[int] = None) -> str:
+        """调用 MiniMax API（流式读取，不阻塞事件循环）
+
+        expected_blocks: 已知响应应包含的代码块数量；全部闭合后提前结束生成。
+        """
+        buf: list[str] = []
+        tracker = _CodeBlockTracker()
+        async with self.aclient.stream(
+            "POST",
+            "/v1/chat/completions",
+            json={
+                "model": "MiniMax-M2.1",  # 或 MiniMax-M2
+                "messages": [
+                    # 系统提示是静态前缀，标记为可缓存；动态的用户上下文不缓存
+                    {"role": "system", "content": [
+                        {"type": "text", "text": system_prompt,
+                         "cache_control": {"type": "ephemeral"}}
+                    ]},
+                    {"role": "user", "content": user_prompt}
+                ],
+                "max_tokens": max_tokens,
+                "temperature": 0.7,
+                "stream": True
+            },
+        ) as resp:
+            resp.raise_for_status()
+            content_type = resp.headers.get("content-type", "")
+            if not content_type.startswith("text/event-stream"):
+                # 非流式响应（如 200 状态的 JSON 错误体），不能当作空结果
+                body = (await resp.aread()).decode("utf-8", "replace")
+                raise RuntimeError(f"MiniMax 返回了非流式响应 ({content_type}): {body[:500]}")
+            async for line in resp.aiter_lines():
+                chunk = _parse_sse(line)
+                if not chunk:
+                    continue
+                buf.append(chunk)
+                tracker.feed(chunk)
+                if expected_blocks is not None and tracker.closed >= expected_blocks:
+                    # 所需代码块已完整，无需等待剩余 token
+                    await resp.aclose()
+                    break
+        if not buf:
+            raise RuntimeError("MiniMax 流式响应中没有任何内容")
+        return "".join(buf)
+
+    async def __aenter__(self) -> "MiniMaxCodingAgent":
+        """创建整个会话共用的 HTTP 客户端，并发请求复用 keep-alive 连接"""
+        self.aclient = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            ),
+            timeout=httpx.Timeout(120, connect=5),
         )
-        return response.choices[0].message.content
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            await self.aclose()
+            return
+        # 会话已因异常退出：仍然清理，但不刷新快照，也不让清理错误覆盖原异常
+        try:
+            await self.aclose(refresh_snapshot=False)
+        except Exception:
+            pass  # drain() 已打印后台任务错误
+    
+    async def aclose(self, refresh_snapshot: bool = True) -> None:
+        """等待后台任务完成，写回 bearings 快照并关闭 HTTP 客户端"""
+        try:
+            await self.drain()
+            if refresh_snapshot:
+                # 后台提交和进度更新都已落盘，按最新状态刷新快照供下次启动复用
+                try:
+                    await self.get_bearings()
+                    self._save_bearings_cache()
+                except Exception as e:
+                    print(f"保存 bearings 快照失败: {e!r}")
+        finally:
+            if self.aclient is not None:
+                await self.aclient.aclose()
+                self.aclient = None
     
-    def run_shell(self, cmd: str) -> tuple[int, str, str]:
-        """执行shell命令"""
-        result = subprocess.run(
-            cmd, shell=True, capture_output=True, text=True, cwd=str(self.workspace_dir)
+    def schedule(self, coro) -> asyncio.Task:
+        """将协程作为后台任务调度，不阻塞当前会话"""
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+    
+    async def drain(self) -> None:
+        """等待所有后台任务完成；有任务失败时打印全部错误并抛出第一个"""
+        errors: list[BaseException] = []
+        while self._background:
+            results = await asyncio.gather(*self._background, return_exceptions=True)
+            for result in results:
+                if isinstance(result, BaseException):
+                    print(f"后台任务失败: {result!r}")
+                    errors.append(result)
+        if errors:
+            raise errors[0]
+    
+    async def _run(self, *argv: str, cwd: Optional[Path] = None) -> tuple[int, str, str]:
+        """直接执行命令（argv 列表，不经过 shell）
+
+        命令无法启动（如未安装）时与 shell 一致返回 127，而不是抛出异常。
+        """
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *argv,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=str(cwd or self.workspace_dir),
+            )
+        except OSError as e:
+            return 127, "", str(e)
+        out, err = await proc.communicate()
+        return proc.returncode, out.decode(), err.decode()
+    
+    async def run_shell(self, cmd: str) -> tuple[int, str, str]:
+        """执行shell命令（异步子进程）
+
+        注意：cmd 由 shell 解释，仅用于用户提供的命令；内部命令请使用 _run。
+        """
+        proc = await asyncio.create_subprocess_shell(
+            cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=str(self.workspace_dir),
         )
-        return result.returncode, result.stdout, result.stderr
+        out, err = await proc.communicate()
+        return proc.returncode, out.decode(), err.decode()
+    
+    def _git_repo(self):
+        """打开工作目录的 pygit2 仓库；不可用时返回 None"""
+        if self._repo is None and pygit2 is not None:
+            try:
+                self._repo = pygit2.Repository(str(self.workspace_dir))
+            except pygit2.GitError:
+                return None
+        return self._repo
     
-    def git_commit(self, message: str) -> bool:
+    def _with_repo_lock(self, fn, *args):
+        """在仓库锁内执行 pygit2 操作（于工作线程中调用）"""
+        with self._repo_lock:
+            return fn(*args)
+    
+    @staticmethod
+    def _pygit2_commit(repo, message: str) -> bool:
+        """进程内等价于 git add -A && git commit -m message"""
+        try:
+            index = repo.index
+            index.add_all()
+            for path, flags in repo.status().items():
+                if flags & pygit2.GIT_STATUS_WT_DELETED:
+                    index.remove(path)
+            index.write()
+            tree = index.write_tree()
+            parents = [] if repo.head_is_unborn else [repo.head.target]
+            if parents and repo[parents[0]].tree_id == tree:
+                return False  # 没有可提交的变更
+            sig = repo.default_signature
+            repo.create_commit("HEAD", sig, sig, message, tree, parents)
+            return True
+        except (pygit2.GitError, KeyError):
+            return False
+    
+    @staticmethod
+    def _pygit2_log(repo, n: int) -> list[str]:
+        """进程内等价于 git log --oneline -n"""
+        if repo.head_is_unborn:
+            return []
+        walker = repo.walk(repo.head.target, pygit2.GIT_SORT_TIME)
+        log = []
+        for commit in islice(walker, n):
+            summary = commit.message.split("\n", 1)[0]
+            log.append(f"{commit.short_id} {summary}")
+        return log
+    
+    async def git_log(self, n: int = 20) -> Optional[list[str]]:
+        """最近 n 条提交（--oneline 格式）；不是 git 仓库时返回 None"""
+        repo = self._git_repo()
+        if repo is not None:
+            return await asyncio.to_thread(self._with_repo_lock, self._pygit2_log, repo, n)
+        code, stdout, _ = await self._run("git", "log", "--oneline", f"-{n}")
+        if code != 0:
+            return None
+        return stdout.strip().split('\n')
+    
+    async def git_commit(self, message: str) -> bool:
         """Git 提交"""
-        code, stdout, stderr = self.run_shell(f"git add -A && git commit -m '{message}'")
+        repo = self._git_repo()
+        if repo is not None:
+            return await asyncio.to_thread(self._with_repo_lock, self._pygit2_commit, repo, message)
+        code, _, _ = await self._run("git", "add", "-A")
+        if code != 0:
+            return False
+        code, _, _ = await self._run("git", "commit", "-m", message)
         return code == 0
     
-    def git_push(self) -> bool:
+    async def git_push(self) -> bool:
         """Git 推送"""
-        code, stdout, stderr = self.run_shell("git push origin main")
+        code, _, _ = await self._run("git", "push", "origin", "main")
         return code == 0
     
+    async def finish_session(self, commit_message: str, progress_message: str) -> None:
+        """会话收尾：提交并更新进度（按调度顺序串行执行）"""
+        async with self._commit_lock:
+            await self.git_commit(commit_message)
+            self.update_progress(progress_message)
+    
     def read_file(self, filepath: Path) -> Optional[str]:
         """读取文件"""
         if filepath.exists():
@@ -82,115 +513,183 @@ class MiniMaxCodingAgent:
     
     def update_progress(self, message: str) -> None:
         """更新进度文件"""
-        timestamp = datetime.now().isoformat()
-        progress = f"[{timestamp}] {message}\n"
-        if self.progress_file.exists():
-            existing = self.progress_file.read_text()
-            self.write_file(self.progress_file, existing + progress)
+        # 追加写入，无需读回整个文件
+        with self.progress_file.open("a", encoding="utf-8") as f:
+            f.write(f"[{datetime.now().isoformat()}] {message}\n")
+    
+    def _migrate_legacy_features(self) -> None:
+        """将旧版 JSON 数组格式的 feature_list.json 转写为 NDJSON"""
+        try:
+            features = _json_loads(self.legacy_feature_file.read_bytes())
+        except (OSError, ValueError):
+            return
+        if not isinstance(features, list):
+            return
+        # 先写临时文件再原子替换，中断时不会留下截断的 NDJSON
+        tmp_file = self.feature_file.with_name(self.feature_file.name + ".tmp")
+        with tmp_file.open("wb") as f:
+            for feature in features:
+                f.write(_json_dumps(feature) + b"\n")
+        os.replace(tmp_file, self.feature_file)
+    
+    def _iter_raw_features(self) -> Iterator[bytes]:
+        """逐行产出功能列表中每个功能的原始 JSON（NDJSON，每行一个功能）"""
+        if not self.feature_file.exists() and self.legacy_feature_file.exists():
+            self._migrate_legacy_features()
+        if not self.feature_file.exists():
+            return
+        with self.feature_file.open("rb") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+    
+    def _iter_feature_status(self) -> Iterator[tuple[bool, bytes]]:
+        """逐个产出 (passes, 原始 JSON)，只解码 passes 字段"""
+        for raw in self._iter_raw_features():
+            try:
+                yield _decode_passes(raw), raw
+            except ValueError:
+                continue
+    
+    @staticmethod
+    def _mtime_ns(path: Path) -> int:
+        """返回文件修改时间（纳秒），不存在时为 0"""
+        try:
+            return path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return 0
+    
+    def _find_git_dir(self) -> Optional[Path]:
+        """向上查找工作目录所属仓库的 git 目录，与 git 自身的查找规则一致"""
+        if self._git_dir is not None:
+            return self._git_dir
+        if pygit2 is not None:
+            found = pygit2.discover_repository(str(self.workspace_dir))
+            if found:
+                self._git_dir = Path(found)
+            return self._git_dir
+        for parent in (self.workspace_dir, *self.workspace_dir.parents):
+            dotgit = parent / ".git"
+            if dotgit.is_dir():
+                self._git_dir = dotgit
+                break
+            if dotgit.is_file():
+                # worktree / submodule：.git 文件内容为 "gitdir: <path>"
+                content = dotgit.read_text(encoding="utf-8").strip()
+                if content.startswith("gitdir:"):
+                    self._git_dir = (parent / content[7:].strip()).resolve()
+                    break
+        return self._git_dir
+    
+    def _bearings_key(self) -> tuple:
+        """get_bearings 依赖的文件 mtime，任一变化即缓存失效"""
+        git_dir = self._find_git_dir()
+        if git_dir is not None:
+            # 暂存、提交、切换分支分别会更新 index、logs/HEAD、HEAD
+            git_key = tuple(self._mtime_ns(git_dir / name)
+                            for name in ("index", "HEAD", "logs/HEAD"))
         else:
-            self.write_file(self.progress_file, progress)
+            git_key = (0, 0, 0)
+        return (
+            self._mtime_ns(self.workspace_dir),
+            *git_key,
+            self._mtime_ns(self.progress_file),
+            self._mtime_ns(self.feature_file),
+            self._mtime_ns(self.legacy_feature_file),
+        )
     
-    def get_bearings(self) -> dict:
-        """获取当前项目状态"""
+    def _load_bearings_cache(self) -> None:
+        """从磁盘加载 bearings 快照，mtime 不匹配时丢弃"""
+        try:
+            with self.bearings_cache_file.open("rb") as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                cached = _json_loads(mm[:])
+        except (OSError, ValueError):
+            return
+        if not isinstance(cached, dict):
+            return
+        key = tuple(cached.get("key", ()))
+        if key == self._bearings_key() and isinstance(cached.get("status"), dict):
+            self._bearings_cache = (key, cached["status"])
+    
+    def _save_bearings_cache(self) -> None:
+        """将 bearings 快照写回磁盘，供下一次进程复用"""
+        if self._bearings_cache is None:
+            return
+        key, status = self._bearings_cache
+        try:
+            self.bearings_cache_file.write_bytes(
+                _json_dumps({"key": list(key), "status": status})
+            )
+        except OSError:
+            pass
+    
+    def _list_workspace_files(self) -> list[str]:
+        """列出工作目录文件"""
+        if not self.workspace_dir.exists():
+            return []
+        return [f.name for f in self.workspace_dir.iterdir()
+                if f.is_file() and not f.name.startswith('.')]
+    
+    def _scan_features(self) -> tuple[int, Optional[dict]]:
+        """流式扫描功能列表：已完成的只计数，第一个未完成的功能即当前工作"""
+        completed = 0
+        current = None
+        for passes, raw in self._iter_feature_status():
+            if passes:
+                completed += 1
+            elif current is None:
+                current = _json_loads(raw)
+        return completed, current
+    
+    async def get_bearings(self) -> dict:
+        """获取当前项目状态（文件未变化时直接返回缓存）"""
+        key = self._bearings_key()
+        if self._bearings_cache is not None and self._bearings_cache[0] == key:
+            return self._bearings_cache[1]
+        
         status = {
             "directory": str(self.workspace_dir),
             "files": [],
             "git_log": [],
-            "features_completed": [],
+            "features_completed": 0,
             "current_work": None
         }
         
-        # 列出工作目录文件
-        if self.workspace_dir.exists():
-            status["files"] = [f.name for f in self.workspace_dir.iterdir() 
-                            if f.is_file() and not f.name.startswith('.')]
-        
-        # 读取 git 日志
-        code, stdout, _ = self.run_shell("git log --oneline -20")
-        if code == 0:
-            status["git_log"] = stdout.strip().split('\n')[:10]
+        # 四项读取互不依赖，并发执行
+        files, git_log, progress, (completed, current) = await asyncio.gather(
+            asyncio.to_thread(self._list_workspace_files),
+            self.git_log(20),
+            asyncio.to_thread(self.read_file, self.progress_file),
+            asyncio.to_thread(self._scan_features),
+        )
         
-        # 读取进度文件
-        progress = self.read_file(self.progress_file)
+        status["files"] = files
+        if git_log is not None:
+            status["git_log"] = git_log[:10]
         if progress:
             status["progress_history"] = progress.strip().split('\n')[-5:]
+        status["features_completed"] = completed
+        status["current_work"] = current
         
-        # 读取功能列表
-        features = self.read_file(self.feature_file)
-        if features:
-            try:
-                feature_data = json.loads(features)
-                status["features_completed"] = [
-                    f for f in feature_data if f.get("passes", False)
-                ]
-            except json.JSONDecodeError:
-                pass
-        
+        self._bearings_cache = (key, status)
         return status
     
     def system_prompt_init(self) -> str:
         """初始化代理的系统提示"""
-        return """你是项目的初始化代理。你的任务是：
-1. 设置项目的初始环境
-2. 创建详细的 feature_list.json，列出所有需要实现的功能
-3. 创建 init.sh 启动脚本
-4. 创建 claude-progress.txt 记录项目状态
-5. 进行初始的 git 提交
-
-工作流程：
-- 仔细阅读用户的任务需求
-- 将需求分解为具体的、可测试的功能点
-- 每个功能包含：分类、描述、测试步骤
-- 标记所有功能为 "passes": false
-- 写一个 init.sh 可以启动开发服务器
-- 初始提交所有文件
-
-输出格式：
-- feature_list.json: JSON 格式的功能列表
-- init.sh: 启动脚本
-- claude-progress.txt: 初始进度记录"""
+        return SYS_INIT
     
     def system_prompt_coding(self) -> str:
         """编码代理的系统提示"""
-        return """你是项目的编码代理。你的任务是：
-1. 每次会话只实现一个功能
-2. 实现后进行端到端测试
-3. 更新 feature_list.json 中对应功能的状态
-4. 提交 git 并更新进度文件
-
-工作流程：
-1. 首先获取当前状态：
-   - 运行 pwd 查看工作目录
-   - 读取 claude-progress.txt 了解最近工作
-   - 读取 feature_list.json 选择下一个要实现的功能
-   - 检查 git 日志
-   
-2. 实现功能：
-   - 只实现一个功能点
-   - 写清晰的代码
-   - 添加必要的注释
-   
-3. 测试验证：
-   - 运行端到端测试
-   - 只有测试通过才标记为完成
-   - 更新 feature_list.json 中的 passes 字段
-   
-4. 结束会话：
-   - Git 提交：描述做了什么
-   - 更新 claude-progress.txt
-   - 如果有远程，推送代码
-
-重要规则：
-- 一次只做一个功能
-- 必须测试通过才能标记完成
-- 不能因为已经做了些工作就宣布项目完成"""
+        return SYS_CODING
     
-    def initialize_project(self, user_task: str) -> None:
+    async def initialize_project(self, user_task: str) -> None:
         """初始化项目"""
         self.update_progress("开始初始化项目")
         
         # 获取当前状态
-        bearings = self.get_bearings()
+        bearings = await self.get_bearings()
         
         user_prompt = f"""
 用户任务：{user_task}
@@ -199,31 +698,29 @@ class MiniMaxCodingAgent:
 已有文件：{bearings.get('files', [])}
 
 请完成以下任务：
-1. 创建详细的 feature_list.json（JSON格式），列出所有需要实现的功能点
-2. 创建 init.sh 启动脚本（如果需要）
+1. 创建详细的 feature_list.ndjson（NDJSON格式，每行一个功能），列出所有需要实现的功能点
+2. 创建 init.sh 启动脚本
 3. 创建 claude-progress.txt 初始记录
 4. 进行 git 初始提交
 
+请按顺序用 3 个代码块分别输出 feature_list.ndjson、init.sh、claude-progress.txt 的完整内容，
+代码块之外不要再输出其他代码块。
+
 功能列表格式示例：
 ```json
-[
-  {{
-    "category": "functional",
-    "description": "功能描述",
-    "steps": ["步骤1", "步骤2", "步骤3"],
-    "passes": false
-  }}
-]
+{{"category": "functional", "description": "功能描述1", "steps": ["步骤1", "步骤2"], "passes": false}}
+{{"category": "functional", "description": "功能描述2", "steps": ["步骤1", "步骤2"], "passes": false}}
 ```
 """
         
-        response = self.call_minimax(self.system_prompt_init(), user_prompt)
+        response = await self.call_minimax(SYS_INIT, user_prompt,
+                                           expected_blocks=_INIT_EXPECTED_BLOCKS)
         
         # 解析响应并创建文件
         self.save_agent_output(response)
         
         # 提交
-        self.git_commit("Initial commit: project setup")
+        await self.git_commit("Initial commit: project setup")
         self.update_progress("项目初始化完成")
         
         print("项目初始化完成！")
@@ -233,14 +730,14 @@ class MiniMaxCodingAgent:
         # 这里可以解析 markdown 代码块，保存文件
         pass
     
-    def coding_session(self, user_instruction: str = None) -> None:
+    async def coding_session(self, user_instruction: str = None) -> None:
         """执行编码会话"""
         print("\n" + "="*50)
         print("开始编码会话")
         print("="*50)
         
         # 1. 获取当前状态
-        bearings = self.get_bearings()
+        bearings = await self.get_bearings()
         print(f"工作目录: {bearings['directory']}")
         print(f"已有文件: {bearings.get('files', [])}")
         
@@ -249,63 +746,135 @@ class MiniMaxCodingAgent:
             for log in bearings['git_log'][:5]:
                 print(f"  {log}")
         
-        # 2. 读取功能列表
-        features = self.read_file(self.feature_file)
+        # 2. 准备用户提示
+        # 超出 token 上限时从头部截断，因此按重要性递增排列：
+        # 目录和文件列表在前，提交从旧到新（最新的紧挨指令），指令在最后
+        context = "\n".join((
+            f"当前工作目录: {bearings['directory']}",
+            f"已有文件: {bearings.get('files', [])}",
+            "",
+            "最近 git 提交（从旧到新）:",
+            *reversed(bearings.get('git_log', [])),
+            "",
+            f"用户指令: {user_instruction}" if user_instruction else _CODING_DEFAULT_INSTRUCTION,
+        ))
+        # 分词器首次加载可能需要下载，放到线程中执行以免阻塞事件循环
+        context = await asyncio.to_thread(_fit, context, self.max_ctx_tokens)
         
-        # 3. 准备用户提示
-        context = f"""
-当前工作目录: {bearings['directory']}
-已有文件: {bearings.get('files', [])}
-
-最近 git 提交:
-{bearings.get('git_log', [])}
-
-"""
-        
-        if user_instruction:
-            context += f"\n用户指令: {user_instruction}"
-        else:
-            context += """
-请选择 feature_list.json 中优先级最高的未完成功能进行实现。
-实现后更新功能状态，进行测试，然后提交代码。
-"""
-        
-        # 4. 调用 MiniMax
-        response = self.call_minimax(self.system_prompt_coding(), context)
+        # 3. 调用 MiniMax
+        response = await self.call_minimax(SYS_CODING, context)
         
         print("\nAgent 响应:")
         print("-"*50)
         print(response[:1000] + "..." if len(response) > 1000 else response)
         print("-"*50)
         
-        # 5. 解析响应并创建文件
+        # 4. 解析响应并创建文件
         self.save_agent_output(response)
         
-        # 6. 提交并更新进度
-        self.git_commit("Update: progress from coding session")
-        self.update_progress("编码会话完成")
+        # 5. 提交并更新进度（后台执行，与下一次会话重叠）
+        self.schedule(self.finish_session(
+            "Update: progress from coding session", "编码会话完成"
+        ))
         
         print("\n编码会话完成！")
+    
+    def iter_pending_features(self) -> Iterator[dict]:
+        """按优先级顺序逐个产出未完成的功能"""
+        return (_json_loads(raw) for passes, raw in self._iter_feature_status() if not passes)
+    
+    def render_feature(self, feature: dict) -> str:
+        """为单个功能生成编码提示"""
+        steps = feature.get("steps") or []
+        if isinstance(steps, str):
+            steps = [steps]
+        steps = "\n".join(f"- {step}" for step in steps)
+        return f"""
+当前工作目录: {self.workspace_dir}
+
+请实现以下功能：
+分类: {feature.get('category', '')}
+描述: {feature.get('description', '')}
+测试步骤:
+{steps}
+
+实现后进行测试，只有测试通过才标记为完成。
+"""
+    
+    async def coding_session_batch(self, n: int) -> None:
+        """并行实现前 n 个未完成功能，最后统一提交一次"""
+        print("\n" + "="*50)
+        print(f"开始批量编码会话（{n} 个功能，并发 {self.max_concurrency}）")
+        print("="*50)
+        
+        system_prompt = SYS_CODING
+        
+        async def one(feature: dict) -> tuple[dict, object]:
+            try:
+                return feature, await self.call_minimax(system_prompt, self.render_feature(feature))
+            except Exception as e:
+                return feature, e
+        
+        # 惰性取出前 n 个未完成功能，窗口内最多 max_concurrency 个请求在执行
+        coros = (one(f) for f in islice(self.iter_pending_features(), n))
+        
+        total = done = 0
+        async for task in _bounded_map(coros, self.max_concurrency):
+            feature, result = task.result()
+            total += 1
+            if isinstance(result, Exception):
+                print(f"功能失败: {feature.get('description')} ({result})")
+                continue
+            self.save_agent_output(result)
+            done += 1
+        
+        if not total:
+            print("没有未完成的功能")
+            return
+        
+        self.schedule(self.finish_session(
+            f"Update: {done} features from batch coding session",
+            f"批量编码会话完成：{done}/{total} 个功能",
+        ))
+        
+        print(f"\n批量编码会话完成！成功 {done}/{total}")
+
+
+async def _amain(args) -> None:
+    """异步主流程"""
+    async with MiniMaxCodingAgent(api_key=args.api_key, base_url=args.base_url,
+                                  max_concurrency=args.concurrency,
+                                  max_ctx_tokens=args.max_ctx_tokens) as agent:
+        if args.init:
+            await agent.initialize_project(args.init)
+        elif args.batch is not None:
+            await agent.coding_session_batch(args.batch)
+        else:
+            await agent.coding_session(args.code)
 
 
 def main():
-    """主入口"""
+    """主入口（同步包装，保持 CLI 兼容）"""
     import argparse
     
+    def positive_int(value: str) -> int:
+        number = int(value)
+        if number < 1:
+            raise argparse.ArgumentTypeError(f"必须为正整数: {value}")
+        return number
+    
     parser = argparse.ArgumentParser(description="MiniMax Coding Agent")
     parser.add_argument("--api-key", required=True, help="MiniMax API Key")
     parser.add_argument("--init", type=str, help="初始化项目：描述你的任务")
     parser.add_argument("--code", type=str, help="执行编码会话：可选的指令")
     parser.add_argument("--base-url", default="https://api.minimax.chat", help="API Base URL")
+    parser.add_argument("--batch", type=positive_int, help="批量编码会话：并行实现的功能数量")
+    parser.add_argument("--concurrency", type=positive_int, default=4, help="MiniMax 最大并发请求数")
+    parser.add_argument("--max-ctx-tokens", type=positive_int, default=16384, help="编码会话上下文的 token 上限")
     
     args = parser.parse_args()
     
-    agent = MiniMaxCodingAgent(api_key=args.api_key, base_url=args.base_url)
-    
-    if args.init:
-        agent.initialize_project(args.init)
-    else:
-        agent.coding_session(args.code)
+    asyncio.run(_amain(args))
 
 
 if __name__ == "__main__":